@@ -1,53 +1,125 @@
+import csv
+import io
+
 import streamlit as st
-import sqlite3
 import pandas as pd
-from datetime import datetime
-import psycopg2
-import zoneinfo
+from contextlib import contextmanager
+import psycopg
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
 
 st.set_page_config(layout="wide")
 
+# Nombre de transactions affichées par page dans l'historique
+PAGE_SIZE = 50
+
 # ------------------------------------------------------------------
 # GESTION DE LA BASE DE DONNÉES
 # ------------------------------------------------------------------
 
-def get_connection():
+@st.cache_resource
+def get_pool():
+    """Crée le pool de connexions une seule fois par processus.
+
+    Le pool est mis en cache par Streamlit et partagé entre toutes les
+    sessions ; le schéma et les types par défaut ne sont donc initialisés
+    qu'une seule fois, et non à chaque interaction. psycopg (v3) prépare
+    automatiquement les requêtes répétées côté serveur, et `check` écarte
+    les connexions périmées avant de les prêter.
+    """
     # Récupère l'URL de connexion stockée dans st.secrets
     db_url = st.secrets["db_url"]
-    conn = psycopg2.connect(db_url)
-    return conn
+    # Le fuseau est fixé côté session : les dates (DEFAULT NOW()) sont
+    # stockées en TIMESTAMPTZ et affichées en heure de Paris.
+    pool = ConnectionPool(conninfo=db_url, min_size=1, max_size=20,
+                          check=ConnectionPool.check_connection,
+                          kwargs={"options": "-c timezone=Europe/Paris"})
+    with pool.connection() as conn:
+        # Sonde le catalogue : si les tables existent déjà (déploiement
+        # existant), on évite de rejouer le DDL et le SELECT COUNT des
+        # types par défaut.
+        with conn.cursor() as c:
+            c.execute("SELECT to_regclass('transactions')")
+            schema_exists = c.fetchone()[0] is not None
+        if not schema_exists:
+            init_db(conn)
+            add_default_cartridge_types(conn)
+        else:
+            migrate_db(conn)
+    return pool
+
+@contextmanager
+def get_conn():
+    """Emprunte une connexion au pool et la restitue en fin de bloc.
+
+    Le bloc est aussi la transaction : commit unique en sortie normale,
+    rollback sur exception. Les écritures groupées dans un même bloc ne
+    coûtent donc qu'un seul fsync côté serveur.
+    """
+    pool = get_pool()
+    with pool.connection() as conn:
+        yield conn
 
 def init_db(conn):
-    """Crée les tables nécessaires si elles n'existent pas déjà."""
-    c = conn.cursor()
-    # Table des types de cartouches
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS cartridge_types (
-            id SERIAL PRIMARY KEY,
-            name TEXT NOT NULL,
-            full_gas_mass REAL NOT NULL,
-            empty_mass REAL NOT NULL,
-            color TEXT NOT NULL,
-            butane REAL NOT NULL,
-            propane REAL NOT NULL
-        )
-    ''')
-    # Table pour l'historique des transactions, avec nom du client
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS transactions (
-            id SERIAL PRIMARY KEY,
-            date TEXT NOT NULL,
-            cartridge_type_id INTEGER NOT NULL,
-            color TEXT NOT NULL,
-            measured_weight REAL NOT NULL,
-            gas_mass REAL NOT NULL,
-            missing_gas REAL NOT NULL,
-            butane_to_add REAL NOT NULL,
-            propane_to_add REAL NOT NULL,
-            client_name TEXT
-        )
-    ''')
-    conn.commit()
+    """Crée les tables nécessaires si elles n'existent pas déjà.
+
+    Les quatre ordres DDL partent en mode pipeline : un seul aller-retour
+    serveur au lieu de quatre.
+    """
+    with conn.pipeline():
+        c = conn.cursor()
+        # Table des types de cartouches
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS cartridge_types (
+                id SERIAL PRIMARY KEY,
+                name TEXT NOT NULL,
+                full_gas_mass REAL NOT NULL,
+                empty_mass REAL NOT NULL,
+                color TEXT NOT NULL,
+                butane REAL NOT NULL,
+                propane REAL NOT NULL
+            )
+        ''')
+        # Table pour l'historique des transactions, avec nom du client
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS transactions (
+                id SERIAL PRIMARY KEY,
+                date TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                cartridge_type_id INTEGER NOT NULL,
+                color TEXT NOT NULL,
+                measured_weight REAL NOT NULL,
+                gas_mass REAL NOT NULL,
+                missing_gas REAL NOT NULL,
+                butane_to_add REAL NOT NULL,
+                propane_to_add REAL NOT NULL,
+                client_name TEXT
+            )
+        ''')
+        # Index pour le tri de l'historique et pour le JOIN sur les types :
+        # le ORDER BY date DESC devient un parcours d'index au lieu d'un tri.
+        c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date DESC)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_cartridge ON transactions (cartridge_type_id)")
+
+def migrate_db(conn):
+    """Aligne un schéma existant sur la définition courante.
+
+    Les bases créées avant le passage à TIMESTAMPTZ ont une colonne date
+    TEXT sans valeur par défaut ; comme init_db n'est pas rejoué sur une
+    base existante, sans ce rattrapage le premier INSERT sans date
+    violerait le NOT NULL. Idempotent, exécuté une fois par processus.
+    """
+    with conn.cursor() as c:
+        c.execute('''
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'transactions' AND column_name = 'date'
+        ''')
+        (date_type,) = c.fetchone()
+        if date_type != 'timestamp with time zone':
+            c.execute("ALTER TABLE transactions ALTER COLUMN date TYPE TIMESTAMPTZ USING date::timestamptz")
+        c.execute("ALTER TABLE transactions ALTER COLUMN date SET DEFAULT NOW()")
+        # Les index d'init_db, pour les bases créées avant leur ajout
+        c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date DESC)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_cartridge ON transactions (cartridge_type_id)")
 
 def add_default_cartridge_types(conn):
     """Ajoute 5 types de cartouches par défaut s'ils n'existent pas déjà."""
@@ -62,101 +134,219 @@ def add_default_cartridge_types(conn):
             ("Type D", 600.0, 300.0, "Rouge", 0.60, 0.40),
             ("Type E", 550.0, 280.0, "Bleu", 0.70, 0.30)
         ]
+        # Avec psycopg (v3), executemany regroupe les lignes dans un seul
+        # lot pipeliné : un aller-retour serveur, contre un par ligne
+        # avec l'executemany de psycopg2.
         c.executemany('''
-            INSERT INTO cartridge_types 
-            (name, full_gas_mass, empty_mass, color, butane, propane) 
+            INSERT INTO cartridge_types
+            (name, full_gas_mass, empty_mass, color, butane, propane)
             VALUES (%s, %s, %s, %s, %s, %s)
         ''', default_types)
-        conn.commit()
 
-def get_cartridge_types(conn):
-    """Retourne tous les types de cartouches sous forme de DataFrame."""
-    c = conn.cursor()
-    c.execute("SELECT * FROM cartridge_types")
-    rows = c.fetchall()
-    df = pd.DataFrame(rows, columns=['id', 'name', 'full_gas_mass', 'empty_mass', 'color', 'butane', 'propane'])
-    return df
+@st.cache_data(ttl=300)
+def get_cartridge_types():
+    """Retourne tous les types de cartouches (liste de dicts).
+
+    Pas de DataFrame ici : sur une table de référence de quelques lignes,
+    la construction pandas domine le coût, et la plupart des appelants ne
+    veulent qu'une liste de noms ou un accès par clé. Le résultat est mis
+    en cache : les reruns n'interrogent pas la base tant qu'une écriture
+    n'a pas invalidé le cache (ou que le TTL expire).
+    """
+    with get_conn() as conn:
+        with conn.cursor(row_factory=dict_row) as c:
+            c.execute("SELECT * FROM cartridge_types")
+            return c.fetchall()
+
+def get_type_lookups():
+    """Retourne (liste des types, dict nom->type, dict id->type).
 
-def add_cartridge_type(conn, name, full_gas_mass, empty_mass, color, butane, propane):
+    Les dictionnaires dérivés sont mémorisés dans st.session_state et
+    gardés par un compteur de version incrémenté à chaque écriture sur
+    les types : les reruns chauds (frappe dans un champ de saisie) ne
+    paient ni le cache Streamlit ni la reconstruction des dicts.
+    """
+    version = st.session_state.get("types_version", 0)
+    if st.session_state.get("_types_lookup_version") != version:
+        types = get_cartridge_types()
+        # Pourcentages d'affichage calculés une fois ici plutôt qu'à
+        # chaque enregistrement de transaction
+        for r in types:
+            r['butane_pct'] = int(round(float(r['butane']) * 100))
+            r['propane_pct'] = int(round(float(r['propane']) * 100))
+        st.session_state["_types_list"] = types
+        st.session_state["_types_by_name"] = {r['name']: r for r in types}
+        st.session_state["_types_by_id"] = {r['id']: r for r in types}
+        st.session_state["_types_lookup_version"] = version
+    return (st.session_state["_types_list"],
+            st.session_state["_types_by_name"],
+            st.session_state["_types_by_id"])
+
+def _bump_types_version():
+    """Invalide les dictionnaires de types mémorisés dans la session."""
+    st.session_state["types_version"] = st.session_state.get("types_version", 0) + 1
+
+def add_cartridge_type(name, full_gas_mass, empty_mass, color, butane, propane):
     """Ajoute un nouveau type de cartouche."""
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO cartridge_types 
-        (name, full_gas_mass, empty_mass, color, butane, propane) 
-        VALUES (%s, %s, %s, %s, %s, %s)
-    ''', (name, full_gas_mass, empty_mass, color, butane, propane))
-    conn.commit()
-
-def update_cartridge_type(conn, id, name, full_gas_mass, empty_mass, color, butane, propane):
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute('''
+                INSERT INTO cartridge_types
+                (name, full_gas_mass, empty_mass, color, butane, propane)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            ''', (name, full_gas_mass, empty_mass, color, butane, propane))
+    get_cartridge_types.clear()
+    _bump_types_version()
+
+def update_cartridge_type(id, name, full_gas_mass, empty_mass, color, butane, propane):
     """Met à jour un type de cartouche existant."""
-    c = conn.cursor()
-    c.execute('''
-        UPDATE cartridge_types 
-        SET name=%s, full_gas_mass=%s, empty_mass=%s, color=%s, butane=%s, propane=%s 
-        WHERE id=%s
-    ''', (name, full_gas_mass, empty_mass, color, butane, propane, id))
-    conn.commit()
-
-def delete_cartridge_type(conn, type_id):
-    c = conn.cursor()
-    c.execute("DELETE FROM cartridge_types WHERE id=%s", (type_id,))
-    conn.commit()
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute('''
+                UPDATE cartridge_types
+                SET name=%s, full_gas_mass=%s, empty_mass=%s, color=%s, butane=%s, propane=%s
+                WHERE id=%s
+            ''', (name, full_gas_mass, empty_mass, color, butane, propane, id))
+    # Le nom du type apparaît aussi dans l'historique (JOIN).
+    get_cartridge_types.clear()
+    get_transactions.clear()
+    _bump_types_version()
 
+def bulk_insert_cartridge_types(rows):
+    """Insère une liste de types en masse via COPY.
 
-def add_transaction(conn, cartridge_type_id, color, measured_weight, gas_mass, missing_gas, butane_to_add, propane_to_add, client_name):
-    """Ajoute une transaction dans la base."""
-    c = conn.cursor()
-    # Create a zone for France (Paris)
-    tz_paris = zoneinfo.ZoneInfo("Europe/Paris")
-    # Get local time in that zone
-    date_str = datetime.now(tz_paris).strftime("%Y-%m-%d %H:%M:%S")
-    
-    # date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute('''
-        INSERT INTO transactions 
-        (date, cartridge_type_id, color, measured_weight, gas_mass, missing_gas, butane_to_add, propane_to_add, client_name)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ''', (date_str, cartridge_type_id, color, measured_weight, gas_mass, missing_gas, butane_to_add, propane_to_add, client_name))
-    conn.commit()
+    COPY court-circuite le protocole requête/réponse par ligne : une
+    seule passe serveur quel que soit le nombre de lignes, là où un
+    INSERT par ligne coûte un aller-retour chacun.
 
+    Chaque ligne : (name, full_gas_mass, empty_mass, color, butane, propane).
+    """
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            with c.copy('''
+                COPY cartridge_types (name, full_gas_mass, empty_mass, color, butane, propane)
+                FROM STDIN
+            ''') as copy:
+                for row in rows:
+                    copy.write_row(row)
+    get_cartridge_types.clear()
+    _bump_types_version()
 
-def get_transactions(conn):
-    """Retourne toutes les transactions sous forme de DataFrame."""
-    c = conn.cursor()
-    c.execute('''
-        SELECT t.id, t.date, ct.name as cartridge_name, t.color, t.measured_weight, 
+def bulk_insert_transactions(rows):
+    """Insère une liste de transactions en masse via COPY.
+
+    Chaque ligne : (cartridge_type_id, color, measured_weight, gas_mass,
+    missing_gas, butane_to_add, propane_to_add, client_name) ; la date
+    est horodatée par le serveur (DEFAULT NOW()).
+    """
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            with c.copy('''
+                COPY transactions (cartridge_type_id, color, measured_weight, gas_mass,
+                                   missing_gas, butane_to_add, propane_to_add, client_name)
+                FROM STDIN
+            ''') as copy:
+                for row in rows:
+                    copy.write_row(row)
+    get_transactions.clear()
+
+def delete_cartridge_type(type_id):
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM cartridge_types WHERE id=%s", (type_id,))
+    get_cartridge_types.clear()
+    get_transactions.clear()
+    _bump_types_version()
+
+
+def add_transaction(cartridge_type_id, color, measured_weight, gas_mass, missing_gas, butane_to_add, propane_to_add, client_name):
+    """Ajoute une transaction dans la base et retourne son id.
+
+    La date n'est plus formatée côté Python : la colonne a un DEFAULT
+    NOW() et le serveur horodate lui-même l'insertion.
+    """
+    # Requête automatiquement préparée côté serveur par psycopg (v3)
+    # après quelques exécutions : le plan est réutilisé sans PREPARE
+    # explicite.
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute('''
+                INSERT INTO transactions
+                (cartridge_type_id, color, measured_weight, gas_mass, missing_gas, butane_to_add, propane_to_add, client_name)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            ''', (cartridge_type_id, color, measured_weight, gas_mass,
+                  missing_gas, butane_to_add, propane_to_add, client_name))
+            new_id = c.fetchone()[0]
+    get_transactions.clear()
+    return new_id
+
+
+@st.cache_data(ttl=60)
+def get_transactions(limit=PAGE_SIZE, offset=0, client_filter=None):
+    """Retourne une page de transactions sous forme de DataFrame.
+
+    La pagination et le filtre par client sont faits côté serveur : seules
+    `limit` lignes transitent sur le réseau et sont converties en
+    DataFrame, quelle que soit la taille de l'historique. Mis en cache
+    comme get_cartridge_types ; invalidé par chaque écriture sur les
+    transactions ou les types.
+    """
+    query = '''
+        SELECT t.id, t.date, ct.name as cartridge_name, t.color, t.measured_weight,
                t.gas_mass, t.missing_gas, t.butane_to_add, t.propane_to_add, t.client_name
         FROM transactions t
         JOIN cartridge_types ct ON t.cartridge_type_id = ct.id
-        ORDER BY t.date DESC
-    ''')
-    rows = c.fetchall()
+    '''
+    params = []
+    if client_filter:
+        query += " WHERE t.client_name ILIKE %s"
+        params.append(f"%{client_filter}%")
+    query += " ORDER BY t.date DESC LIMIT %s OFFSET %s"
+    params += [limit, offset]
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute(query, params)
+            rows = c.fetchall()
     df = pd.DataFrame(rows, columns=[
-        'ID', 'Date', 'Type de cartouche', 'Couleur', 
-        'Poids mesuré (g)', 'Masse de gaz (g)', 'Gaz manquant (g)', 
+        'ID', 'Date', 'Type de cartouche', 'Couleur',
+        'Poids mesuré (g)', 'Masse de gaz (g)', 'Gaz manquant (g)',
         'Butane à ajouter (g)', 'Propane à ajouter (g)', 'Nom du client'
     ])
     return df
 
-def delete_transaction(conn, transaction_id):
+def get_transaction_by_id(transaction_id):
+    """Retourne une transaction par son id sous forme de dict (ou None).
+
+    Lecture d'une seule ligne, plutôt qu'un filtre pandas O(n) sur tout
+    l'historique déjà chargé.
+    """
+    with get_conn() as conn:
+        with conn.cursor(row_factory=dict_row) as c:
+            c.execute("SELECT * FROM transactions WHERE id=%s", (transaction_id,))
+            return c.fetchone()
+
+def delete_transaction(transaction_id):
     """Supprime une transaction par son ID."""
-    c = conn.cursor()
-    c.execute("DELETE FROM transactions WHERE id=%s", (transaction_id,))
-    conn.commit()
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM transactions WHERE id=%s", (transaction_id,))
+    get_transactions.clear()
 
-def update_transaction(conn, transaction_id, new_date, new_measured_weight, 
-                       new_gas_mass, new_missing_gas, new_butane_to_add, 
+def update_transaction(transaction_id, new_date, new_measured_weight,
+                       new_gas_mass, new_missing_gas, new_butane_to_add,
                        new_propane_to_add, new_client_name):
     """Met à jour une transaction existante."""
-    c = conn.cursor()
-    c.execute('''
-        UPDATE transactions
-        SET date=%s, measured_weight=%s, gas_mass=%s, missing_gas=%s, 
-            butane_to_add=%s, propane_to_add=%s, client_name=%s
-        WHERE id=%s
-    ''', (new_date, new_measured_weight, new_gas_mass, new_missing_gas, 
-          new_butane_to_add, new_propane_to_add, new_client_name, transaction_id))
-    conn.commit()
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute('''
+                UPDATE transactions
+                SET date=%s, measured_weight=%s, gas_mass=%s, missing_gas=%s,
+                    butane_to_add=%s, propane_to_add=%s, client_name=%s
+                WHERE id=%s
+            ''', (new_date, new_measured_weight, new_gas_mass, new_missing_gas,
+                  new_butane_to_add, new_propane_to_add, new_client_name, transaction_id))
+    get_transactions.clear()
 
 # ------------------------------------------------------------------
 # INTERFACE STREAMLIT
@@ -165,64 +355,70 @@ def update_transaction(conn, transaction_id, new_date, new_measured_weight,
 def main():
     st.title("Application de Remplissage des Cartouches")
 
-    # Connexion et initialisation DB
-    conn = get_connection()
-    init_db(conn)
-    add_default_cartridge_types(conn)
-    
     # Menu
     menu = st.sidebar.selectbox("Menu", ["Transaction", "Configuration", "Historique"])
     
     if menu == "Transaction":
         st.header("Nouvelle Transaction")
-        df_types = get_cartridge_types(conn)
-        if df_types.empty:
+        # Dictionnaires mémorisés par session : la sélection est un accès
+        # O(1) et les reruns chauds ne reconstruisent rien.
+        cartridge_types, types_by_name, _ = get_type_lookups()
+        if not cartridge_types:
             st.error("Aucun type de cartouche disponible. Veuillez ajouter un type dans la section Configuration.")
         else:
             # Sélection du type
-            type_options = df_types['name'].tolist()
-            selected_type_name = st.selectbox("Sélectionnez le type de cartouche", type_options)
-            selected_type = df_types[df_types['name'] == selected_type_name].iloc[0]
+            selected_type_name = st.selectbox("Sélectionnez le type de cartouche", list(types_by_name))
+            selected_type = types_by_name[selected_type_name]
             
             st.write(f"Type choisi: **{selected_type['name']}** (Couleur: {selected_type['color']})")
-            
-            # Nom du client
-            client_name = st.text_input("Nom du client (optionnel)", value="")
-            
-            # Poids mesuré
-            measured_weight = st.number_input("Entrez le poids mesuré de la cartouche (en grammes)", 
-                                              min_value=0.0, format="%.2f")
-            
-            # Un seul bouton pour calculer ET enregistrer
-            if st.button("Calculer et Enregistrer"):
-                empty_mass = selected_type['empty_mass']
-                full_gas_mass = selected_type['full_gas_mass']
+
+            # Formulaire : la saisie du nom et du poids ne déclenche plus
+            # de rerun à chaque frappe, le script ne se ré-exécute qu'à la
+            # soumission (comme les formulaires de la page Configuration).
+            with st.form("nouvelle_transaction"):
+                # Nom du client
+                client_name = st.text_input("Nom du client (optionnel)", value="")
+
+                # Poids mesuré
+                measured_weight = st.number_input("Entrez le poids mesuré de la cartouche (en grammes)",
+                                                  min_value=0.0, format="%.2f")
+
+                # Un seul bouton pour calculer ET enregistrer
+                submitted = st.form_submit_button("Calculer et Enregistrer")
+
+            if submitted:
+                # Extraire une seule fois les champs du type en valeurs
+                # natives plutôt que de réindexer le dict à chaque usage
+                type_id = int(selected_type['id'])
+                type_color = selected_type['color']
+                empty_mass = float(selected_type['empty_mass'])
+                full_gas_mass = float(selected_type['full_gas_mass'])
+                butane_percentage = float(selected_type['butane'])
+                propane_percentage = float(selected_type['propane'])
+                butane_pct = selected_type['butane_pct']
+                propane_pct = selected_type['propane_pct']
+
                 gas_mass = measured_weight - empty_mass
                 if gas_mass < 0:
                     st.error("Le poids mesuré est inférieur à la masse du contenant vide.")
                 else:
-                    missing_gas = full_gas_mass - gas_mass
-                    missing_gas = missing_gas if missing_gas > 0 else 0
-                    
-                    butane_percentage = selected_type['butane']
-                    propane_percentage = selected_type['propane']
-                    
+                    missing_gas = max(0.0, full_gas_mass - gas_mass)
+
                     butane_to_add = missing_gas * butane_percentage
                     propane_to_add = missing_gas * propane_percentage
-                    
+
                     # Afficher les résultats
                     st.subheader("Résultats")
                     st.write(f"Masse de gaz actuel : **{gas_mass:.2f} g**")
                     st.write(f"Gaz manquant pour remplir : **{missing_gas:.2f} g**")
-                    st.write(f"Pour une cartouche {selected_type['color']} :")
-                    st.write(f" - Butane ({butane_percentage*100:.0f}%): **{butane_to_add:.2f} g**")
-                    st.write(f" - Propane ({propane_percentage*100:.0f}%): **{propane_to_add:.2f} g**")
-                    
+                    st.write(f"Pour une cartouche {type_color} :")
+                    st.write(f" - Butane ({butane_pct}%): **{butane_to_add:.2f} g**")
+                    st.write(f" - Propane ({propane_pct}%): **{propane_to_add:.2f} g**")
+
                     # Enregistrer directement
                     add_transaction(
-                        conn=conn,
-                        cartridge_type_id=int(selected_type['id']),
-                        color=selected_type['color'],
+                        cartridge_type_id=type_id,
+                        color=type_color,
                         measured_weight=measured_weight,
                         gas_mass=gas_mass,
                         missing_gas=missing_gas,
@@ -234,11 +430,15 @@ def main():
     
     elif menu == "Configuration":
         st.header("Configuration des Types de Cartouches")
-        
-        # Afficher les types existants
+
+        # Une seule lecture des types pour toute la page ; les écritures
+        # incrémentent la version, le rerun suivant verra la liste à jour.
+        cartridge_types, _, types_by_id = get_type_lookups()
+
+        # Afficher les types existants (le DataFrame n'est construit que
+        # pour l'affichage du tableau)
         st.subheader("Liste des Types Existants")
-        df_types = get_cartridge_types(conn)
-        st.dataframe(df_types)
+        st.dataframe(pd.DataFrame(cartridge_types))
         
         # Formulaire d'ajout
         st.subheader("Ajouter un nouveau type de cartouche")
@@ -263,17 +463,16 @@ def main():
             submitted = st.form_submit_button("Ajouter")
             if submitted:
                 if new_name:
-                    add_cartridge_type(conn, new_name, new_full_gas_mass, new_empty_mass, new_color, new_butane, new_propane)
+                    add_cartridge_type(new_name, new_full_gas_mass, new_empty_mass, new_color, new_butane, new_propane)
                     st.success("Nouveau type ajouté!")
                 else:
                     st.error("Veuillez entrer un nom pour le type de cartouche.")
         
         # Formulaire de modification
         st.subheader("Modifier un type existant")
-        df_types = get_cartridge_types(conn)  # rafraîchir la liste
-        if not df_types.empty:
-            selected_type_id = st.selectbox("Sélectionnez le type à modifier", df_types['id'])
-            selected_type = df_types[df_types['id'] == selected_type_id].iloc[0]
+        if cartridge_types:
+            selected_type_id = st.selectbox("Sélectionnez le type à modifier", list(types_by_id))
+            selected_type = types_by_id[selected_type_id]
             
             with st.form("modif_type"):
                 mod_name = st.text_input("Nom du type", value=selected_type['name'])
@@ -290,74 +489,124 @@ def main():
                 
                 mod_submitted = st.form_submit_button("Mettre à jour")
                 if mod_submitted:
-                    update_cartridge_type(conn, selected_type_id, mod_name, mod_full_gas_mass, 
+                    update_cartridge_type(selected_type_id, mod_name, mod_full_gas_mass, 
                                           mod_empty_mass, mod_color, mod_butane, mod_propane)
                     st.success("Type mis à jour!")
 
         st.subheader("Supprimer un type existant")
-        df_types_delete = get_cartridge_types(conn)  # pour avoir la liste à jour
-
-        if not df_types_delete.empty:
+        if cartridge_types:
             delete_id = st.selectbox(
-                "Sélectionnez le type à supprimer", 
-                df_types_delete['id'], 
-                format_func=lambda x: df_types_delete.loc[df_types_delete['id']==x, 'name'].values[0]
+                "Sélectionnez le type à supprimer",
+                list(types_by_id),
+                format_func=lambda x: types_by_id[x]['name']
             )
             if st.button("Supprimer ce type"):
-                delete_cartridge_type(conn, delete_id)
+                delete_cartridge_type(delete_id)
                 st.success("Type supprimé avec succès!")
-                # st.experimental_rerun()
+
+        # Import en masse : COPY évite un INSERT (et un aller-retour) par ligne
+        st.subheader("Import CSV")
+        uploaded_types = st.file_uploader(
+            "Types de cartouches (CSV sans en-tête : name, full_gas_mass, empty_mass, color, butane, propane)",
+            type="csv", key="import_types"
+        )
+        if uploaded_types is not None and st.button("Importer les types"):
+            rows = list(csv.reader(io.TextIOWrapper(uploaded_types, encoding="utf-8")))
+            try:
+                bulk_insert_cartridge_types(rows)
+            except psycopg.DataError:
+                st.error("CSV invalide : vérifiez l'ordre et le format des colonnes.")
+            else:
+                st.success(f"{len(rows)} type(s) importé(s)!")
+
+        uploaded_transactions = st.file_uploader(
+            "Transactions (CSV sans en-tête : cartridge_type_id, color, measured_weight, "
+            "gas_mass, missing_gas, butane_to_add, propane_to_add, client_name)",
+            type="csv", key="import_transactions"
+        )
+        if uploaded_transactions is not None and st.button("Importer les transactions"):
+            rows = list(csv.reader(io.TextIOWrapper(uploaded_transactions, encoding="utf-8")))
+            try:
+                bulk_insert_transactions(rows)
+            except psycopg.DataError:
+                st.error("CSV invalide : vérifiez l'ordre et le format des colonnes.")
+            else:
+                st.success(f"{len(rows)} transaction(s) importée(s)!")
 
     
     elif menu == "Historique":
         st.header("Historique des Transactions")
-        
-        # Afficher l'historique
-        df_transactions = get_transactions(conn)
+
+        # Filtre + pagination côté serveur : on ne charge jamais tout
+        # l'historique dans pandas ni dans le navigateur.
+        col_filtre, col_page = st.columns(2)
+        with col_filtre:
+            client_filter = st.text_input("Filtrer par nom de client", value="")
+        with col_page:
+            page = st.number_input("Page", min_value=1, step=1, value=1)
+
+        df_transactions = get_transactions(
+            limit=PAGE_SIZE,
+            offset=(page - 1) * PAGE_SIZE,
+            client_filter=client_filter or None
+        )
         st.dataframe(df_transactions, use_container_width=True)
+        if df_transactions.empty and page > 1:
+            st.info("Aucune transaction sur cette page.")
 
         
-        # Modification / Suppression d'une transaction
+        # Modification / Suppression d'une transaction : saisie directe de
+        # l'ID (visible dans le tableau) plutôt qu'un menu déroulant qui
+        # matérialiserait la liste des IDs dans le navigateur.
         st.subheader("Modifier ou Supprimer une transaction")
-        if not df_transactions.empty:
-            transaction_ids = df_transactions['ID'].tolist()
-            selected_trans_id = st.selectbox("Sélectionnez l'ID de la transaction", transaction_ids)
-            selected_trans = df_transactions[df_transactions['ID'] == selected_trans_id].iloc[0]
-            
+        selected_trans_id = st.number_input("ID de la transaction", min_value=0, step=1, value=0,
+                                            help="L'ID figure dans la première colonne du tableau.")
+        if selected_trans_id:
+            # Lecture directe de la ligne choisie, sans refiltrer le DataFrame
+            selected_trans = get_transaction_by_id(selected_trans_id)
+            if selected_trans is None:
+                st.warning(f"Aucune transaction avec l'ID {selected_trans_id}.")
+                st.stop()
+
             st.write("**Transaction sélectionnée :**")
             st.write(selected_trans)
-            
+
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Supprimer la transaction"):
-                    delete_transaction(conn, selected_trans_id)
+                    delete_transaction(selected_trans_id)
                     st.success("Transaction supprimée.")
-                    # st.experimental_rerun()
             
             with col2:
                 # Formulaire de modification
                 with st.expander("Modifier la transaction"):
                     with st.form("edit_transaction"):
-                        new_date = st.text_input("Date", value=selected_trans['Date'])
-                        new_measured_weight = st.number_input("Poids mesuré (g)", 
-                                                              value=float(selected_trans['Poids mesuré (g)']))
-                        new_gas_mass = st.number_input("Masse de gaz (g)", 
-                                                       value=float(selected_trans['Masse de gaz (g)']))
-                        new_missing_gas = st.number_input("Gaz manquant (g)", 
-                                                          value=float(selected_trans['Gaz manquant (g)']))
-                        new_butane_to_add = st.number_input("Butane à ajouter (g)", 
-                                                            value=float(selected_trans['Butane à ajouter (g)']))
-                        new_propane_to_add = st.number_input("Propane à ajouter (g)", 
-                                                             value=float(selected_trans['Propane à ajouter (g)']))
-                        new_client_name = st.text_input("Nom du client", value=selected_trans['Nom du client'] or "")
+                        new_date = st.text_input("Date", value=str(selected_trans['date']))
+                        new_measured_weight = st.number_input("Poids mesuré (g)",
+                                                              value=float(selected_trans['measured_weight']))
+                        new_gas_mass = st.number_input("Masse de gaz (g)",
+                                                       value=float(selected_trans['gas_mass']))
+                        new_missing_gas = st.number_input("Gaz manquant (g)",
+                                                          value=float(selected_trans['missing_gas']))
+                        new_butane_to_add = st.number_input("Butane à ajouter (g)",
+                                                            value=float(selected_trans['butane_to_add']))
+                        new_propane_to_add = st.number_input("Propane à ajouter (g)",
+                                                             value=float(selected_trans['propane_to_add']))
+                        new_client_name = st.text_input("Nom du client", value=selected_trans['client_name'] or "")
                         
                         submitted_edit = st.form_submit_button("Enregistrer les modifications")
                         if submitted_edit:
-                            update_transaction(conn, selected_trans_id, new_date, new_measured_weight, 
-                                               new_gas_mass, new_missing_gas, new_butane_to_add, 
-                                               new_propane_to_add, new_client_name)
-                            st.success("Transaction mise à jour!")
-                            # st.experimental_rerun()
+                            # La date saisie part telle quelle vers la
+                            # colonne TIMESTAMPTZ : le serveur rejette un
+                            # format invalide.
+                            try:
+                                update_transaction(selected_trans_id, new_date, new_measured_weight,
+                                                   new_gas_mass, new_missing_gas, new_butane_to_add,
+                                                   new_propane_to_add, new_client_name)
+                            except psycopg.DataError:
+                                st.error("Date invalide : utilisez le format AAAA-MM-JJ HH:MM:SS.")
+                            else:
+                                st.success("Transaction mise à jour!")
 
 if __name__ == '__main__':
     main()